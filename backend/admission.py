@@ -0,0 +1,114 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+# LLM 호출 동시 실행 수, 대기열 길이, 요청당 마감 시간(초)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "30"))
+LLM_RETRY_AFTER = int(os.getenv("LLM_RETRY_AFTER", "5"))
+
+
+# 과부하로 요청을 거절할 때 사용 (status_code: 429 대기열 초과, 503 마감 시간 초과)
+class LLMOverloadedError(Exception):
+    def __init__(self, message, status_code, retry_after=LLM_RETRY_AFTER):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# LLM 호출 앞단의 동시 실행 제한 + 유한 대기열 + 마감 시간 기반 부하 차단
+class AdmissionController:
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENCY, max_queue=LLM_MAX_QUEUE):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_deadline = 0
+        self.max_waiting_seen = 0
+        self.total_wait = 0.0
+
+    def new_deadline(self, seconds=LLM_DEADLINE) -> float:
+        return time.monotonic() + seconds
+
+    def _acquire(self, deadline):
+        start = time.monotonic()
+        with self._cond:
+            if deadline - start <= 0:
+                self.rejected_deadline += 1
+                raise LLMOverloadedError("응답 마감 시간이 지났습니다. 잠시 후 다시 시도해주세요.", 503)
+
+            if self.in_flight < self.max_concurrent and self.waiting == 0:
+                self.in_flight += 1
+                self.admitted += 1
+                return
+
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                logging.warning(f"LLM 대기열 초과 (대기 {self.waiting}건) → 요청 거절")
+                raise LLMOverloadedError("요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해주세요.", 429)
+
+            self.waiting += 1
+            self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+            try:
+                while self.in_flight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_deadline += 1
+                        logging.warning("LLM 대기 중 마감 시간 초과 → 요청 거절")
+                        raise LLMOverloadedError("응답 대기 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.", 503)
+                    self._cond.wait(remaining)
+                self.in_flight += 1
+                self.admitted += 1
+                self.total_wait += time.monotonic() - start
+            finally:
+                self.waiting -= 1
+
+    # 제어기 앞단(제출 대기 등)에서 바로 거절한 요청도 지표에 반영
+    def reject_queue_full(self) -> LLMOverloadedError:
+        with self._cond:
+            self.rejected_queue_full += 1
+        logging.warning("LLM 요청 수 초과 → 요청 거절")
+        return LLMOverloadedError("요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해주세요.", 429)
+
+    def _release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    # 슬롯을 얻으면 마감까지 남은 시간(초)을 넘겨줌
+    @contextmanager
+    def slot(self, deadline):
+        self._acquire(deadline)
+        try:
+            yield max(0.0, deadline - time.monotonic())
+        finally:
+            self._release()
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_waiting_seen,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_deadline": self.rejected_deadline,
+                "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            }
+
+
+# GPT / Ollama 호출이 함께 쓰는 전역 제어기
+llm_admission = AdmissionController()
+
+__all__ = ["AdmissionController", "LLMOverloadedError", "llm_admission"]
@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+# 동시 요청을 모으는 시간(ms)과 최대 배치 크기
+ENCODE_BATCH_WINDOW_MS = float(os.getenv("ENCODE_BATCH_WINDOW_MS", "3"))
+ENCODE_MAX_BATCH = int(os.getenv("ENCODE_MAX_BATCH", "32"))
+
+
+# 짧은 시간 창 안에 들어온 쿼리 인코딩 요청을 하나의 배치로 묶어 처리
+class EncodeBatcher:
+    def __init__(self, model_loader, window_ms=ENCODE_BATCH_WINDOW_MS, max_batch=ENCODE_MAX_BATCH):
+        self.model_loader = model_loader
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+                self._worker.start()
+
+    # 호출한 스레드는 자기 쿼리의 벡터(float32, 1차원)를 돌려받음
+    def encode(self, text: str, timeout=None) -> np.ndarray:
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # 시간 초과로 포기한 요청은 제외
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                start = time.perf_counter()
+                vectors = self.model_loader().encode(texts, batch_size=len(texts), convert_to_numpy=True)
+                logging.debug(f"쿼리 {len(texts)}건 배치 인코딩: {(time.perf_counter() - start) * 1000:.1f} ms")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(np.asarray(vector, dtype='float32'))
+
+__all__ = ["EncodeBatcher"]
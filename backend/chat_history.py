@@ -1,39 +1,111 @@
-import json
 import os
+import tempfile
+import threading
+import orjson
 
 # 무조건 루트 경로 기준으로 저장되도록 설정
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 CHAT_HISTORY_FILE = os.path.join(BASE_DIR, "chat_history.json")
 SEARCH_HISTORY_FILE = os.path.join(BASE_DIR, "search_history.json")
+CHAT_SEQUENCE_FILE = os.path.join(BASE_DIR, "chat_sequence.json")  # 초기화해도 되돌아가지 않는 마지막 턴 id
 
-# 대화 기록 로딩
-def load_chat_history():
-    if not os.path.exists(CHAT_HISTORY_FILE):
+# numpy 값(검색 결과의 평점 등)도 그대로 직렬화
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# 대화 기록/턴 순번을 읽고-고치고-쓰는 작업은 한 번에 하나씩 (채팅 핸들러는 스레드 풀에서 동시 실행됨)
+_chat_history_lock = threading.Lock()
+
+def read_json_list(path):
+    if not os.path.exists(path):
         return []
-    with open(CHAT_HISTORY_FILE, "r", encoding="utf-8") as file:
+    with open(path, "rb") as file:
         try:
-            return json.load(file)
-        except json.JSONDecodeError:
+            return orjson.loads(file.read())
+        except orjson.JSONDecodeError:
             return []
 
+# 임시 파일에 쓴 뒤 교체해서, 동시에 읽는 쪽이 비어 있거나 잘린 파일을 보지 않게 함
+def write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(orjson.dumps(data, default=str, option=ORJSON_OPTIONS))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# 대화 기록 로딩
+def load_chat_history():
+    return read_json_list(CHAT_HISTORY_FILE)
+
+# cursor(턴 id) 이후의 대화만 불러오기
+def load_chat_history_since(since, chat_history=None):
+    if chat_history is None:
+        chat_history = load_chat_history()
+    if since is None:
+        return chat_history
+    return [turn for turn in chat_history if turn.get("id", 0) > since]
+
+def last_turn_id(chat_history):
+    return max((turn.get("id", 0) for turn in chat_history), default=0)
+
+def load_last_sequence():
+    if not os.path.exists(CHAT_SEQUENCE_FILE):
+        return 0
+    with open(CHAT_SEQUENCE_FILE, "rb") as file:
+        try:
+            return int(orjson.loads(file.read()).get("last_id", 0))
+        except (orjson.JSONDecodeError, AttributeError, TypeError, ValueError):
+            return 0
+
+# 현재 cursor: 대화 초기화 이후에도 계속 증가하는 마지막 턴 id
+def chat_cursor(chat_history=None):
+    if chat_history is None:
+        chat_history = load_chat_history()
+    return max(load_last_sequence(), last_turn_id(chat_history))
+
+# 응답에 붙일 대화 기록 (since가 주어지면 그 이후의 새 대화만 포함)
+def chat_history_view(since, chat_history=None):
+    if chat_history is None:
+        chat_history = load_chat_history()
+    view = {"cursor": chat_cursor(chat_history)}
+    if since is not None:
+        view["chat_history"] = load_chat_history_since(since, chat_history)
+    return view
+
 # 대화 기록 저장
 def save_chat_history(chat_history):
     chat_history = chat_history[-10:]  # 최대 10개 유지
-    with open(CHAT_HISTORY_FILE, "w", encoding="utf-8") as file:
-        json.dump(chat_history, file, ensure_ascii=False, indent=4)
+    write_json(CHAT_HISTORY_FILE, chat_history)
+    return chat_history
 
-# 대화 초기화
+# 대화 초기화 (턴 id 순번은 유지해 기존 cursor가 계속 유효함)
 def reset_chat_history():
-    with open(CHAT_HISTORY_FILE, "w", encoding="utf-8") as file:
-        json.dump([], file, ensure_ascii=False, indent=4)
-    with open(SEARCH_HISTORY_FILE, "w", encoding="utf-8") as file:
-        json.dump([], file, ensure_ascii=False, indent=4)
+    with _chat_history_lock:
+        write_json(CHAT_HISTORY_FILE, [])
+        write_json(SEARCH_HISTORY_FILE, [])
 
-# 대화 추가
+# 대화 추가 (턴마다 증가하는 id를 붙여 cursor로 사용, 저장된 기록을 반환)
 def add_to_chat_history(user_input, bot_response):
-    chat_history = load_chat_history()
-    chat_history.append({"user": user_input, "bot": bot_response})
-    save_chat_history(chat_history)
+    with _chat_history_lock:
+        chat_history = load_chat_history()
+        turn_id = chat_cursor(chat_history) + 1
+        chat_history.append({"id": turn_id, "user": user_input, "bot": bot_response})
+        write_json(CHAT_SEQUENCE_FILE, {"last_id": turn_id})
+        return save_chat_history(chat_history)
+
+# 저장된 턴의 답변 교체 (마감 이후 도착한 GPT 응답으로 요약 답변을 덮어씀, 이미 밀려난 턴이면 무시)
+def update_chat_turn(turn_id, bot_response):
+    with _chat_history_lock:
+        chat_history = load_chat_history()
+        for turn in chat_history:
+            if turn.get("id") == turn_id:
+                turn["bot"] = bot_response
+                save_chat_history(chat_history)
+                return True
+        return False
 
 # 검색 결과 추가 (기본 검색 결과만 저장)
 def add_search_results_to_history(query, search_results):
@@ -48,18 +120,11 @@ def add_search_results_to_history(query, search_results):
 # 검색 기록 저장
 def save_search_history(search_history):
     search_history = search_history[-10:]
-    with open(SEARCH_HISTORY_FILE, "w", encoding="utf-8") as file:
-        json.dump(search_history, file, ensure_ascii=False, indent=4)
+    write_json(SEARCH_HISTORY_FILE, search_history)
 
 # 검색 기록 불러오기
 def load_search_history():
-    if os.path.exists(SEARCH_HISTORY_FILE):
-        with open(SEARCH_HISTORY_FILE, "r", encoding="utf-8") as file:
-            try:
-                return json.load(file)
-            except json.JSONDecodeError:
-                return []
-    return []
+    return read_json_list(SEARCH_HISTORY_FILE)
 
 # 최근 검색 결과만 불러오기
 def load_previous_search_results():
@@ -0,0 +1,157 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 검색 품질 vs. 지연 시간 오프라인 평가
+#
+# 사용법:
+#   python backend/evaluate.py data/golden_queries.jsonl --k 5 --bm25-weights 0.3,0.5,0.7 --min-scores 0.3,0.5 --min-recall 0.8
+#
+# 골든 셋 형식 (JSONL, 한 줄에 한 질문):
+#   {"query": "이지훈 교수님 강의 알려줘", "expected_courses": ["공학설계입문"], "expected_professors": ["이지훈"]}
+
+import json
+import time
+import math
+import argparse
+import itertools
+import logging
+import numpy as np
+
+from backend.config import BM25_WEIGHT, FAISS_TOP_K
+from backend.search import hybrid_search, MIN_SCORE
+
+DEFAULT_GOLDEN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "golden_queries.jsonl")
+
+
+def load_golden_set(path):
+    golden = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            golden.append({
+                "query": item["query"],
+                "expected_courses": item.get("expected_courses", []),
+                "expected_professors": item.get("expected_professors", []),
+            })
+    return golden
+
+# 검색 결과 하나가 맞힌 정답 항목 (강의명 또는 교수명)
+def matched_targets(result, item):
+    targets = set()
+    if result.get("강의명") in item["expected_courses"]:
+        targets.add(("강의명", result["강의명"]))
+    if result.get("교수명") in item["expected_professors"]:
+        targets.add(("교수명", result["교수명"]))
+    return targets
+
+# 이상적인 순위의 이득: 한 행은 강의명 하나와 교수명 하나를 동시에 맞힐 수 있음
+def ideal_gains(item, k):
+    n_courses, n_professors = len(item["expected_courses"]), len(item["expected_professors"])
+    both = min(n_courses, n_professors)
+    return ([2] * both + [1] * (max(n_courses, n_professors) - both))[:k]
+
+def score_query(results, item, k):
+    expected = len(item["expected_courses"]) + len(item["expected_professors"])
+    if expected == 0:
+        return None
+
+    found = set()
+    first_hit = None
+    dcg = 0.0
+    for rank, result in enumerate(results[:k], 1):
+        new_targets = matched_targets(result, item) - found
+        if new_targets:
+            found |= new_targets
+            dcg += len(new_targets) / math.log2(rank + 1)
+            if first_hit is None:
+                first_hit = rank
+
+    ideal = sum(gain / math.log2(rank + 1) for rank, gain in enumerate(ideal_gains(item, k), 1))
+    return {
+        "recall": len(found) / expected,
+        "mrr": 1.0 / first_hit if first_hit else 0.0,
+        "ndcg": dcg / ideal if ideal > 0 else 0.0,
+    }
+
+def evaluate_config(golden, k, bm25_weight, min_score, use_facets):
+    metrics, latencies = [], []
+    for item in golden:
+        start = time.perf_counter()
+        results = hybrid_search(item["query"], top_k=k, bm25_weight=bm25_weight, min_score=min_score,
+                                use_facets=use_facets, save_history=False)
+        latencies.append(time.perf_counter() - start)
+        scored = score_query(results, item, k)
+        if scored is not None:
+            metrics.append(scored)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "bm25_weight": bm25_weight,
+        "min_score": min_score,
+        "use_facets": use_facets,
+        f"recall@{k}": float(np.mean([m["recall"] for m in metrics])) if metrics else 0.0,
+        "mrr": float(np.mean([m["mrr"] for m in metrics])) if metrics else 0.0,
+        f"ndcg@{k}": float(np.mean([m["ndcg"] for m in metrics])) if metrics else 0.0,
+        "latency_mean_ms": float(latencies_ms.mean()),
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+    }
+
+def print_report(reports, k):
+    header = f"{'BM25':>6} {'cutoff':>7} {'facet':>6} {'R@' + str(k):>7} {'MRR':>7} {'nDCG@' + str(k):>8} {'mean':>9} {'p50':>9} {'p95':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        print(f"{r['bm25_weight']:>6.2f} {r['min_score']:>7.2f} {str(r['use_facets']):>6} "
+              f"{r[f'recall@{k}']:>7.3f} {r['mrr']:>7.3f} {r[f'ndcg@{k}']:>8.3f} "
+              f"{r['latency_mean_ms']:>7.1f}ms {r['latency_p50_ms']:>7.1f}ms {r['latency_p95_ms']:>7.1f}ms")
+
+def parse_floats(text):
+    return [float(v) for v in text.split(",") if v.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="hybrid_search 검색 품질/지연 시간 평가")
+    parser.add_argument("golden", nargs="?", default=DEFAULT_GOLDEN_PATH, help="골든 질의 셋 (JSONL)")
+    parser.add_argument("--k", type=int, default=FAISS_TOP_K)
+    parser.add_argument("--bm25-weights", default=str(BM25_WEIGHT))
+    parser.add_argument("--min-scores", default=str(MIN_SCORE))
+    parser.add_argument("--facets", choices=["on", "off", "both"], default="on")
+    parser.add_argument("--min-recall", type=float, default=None, help="이 recall@k 이상인 설정 중 가장 빠른 설정 선택")
+    parser.add_argument("--output", default=None, help="결과를 JSON으로 저장할 경로")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    golden = load_golden_set(args.golden)
+    if not golden:
+        parser.error(f"골든 질의 셋이 비어 있습니다: {args.golden}")
+    facet_options = {"on": [True], "off": [False], "both": [True, False]}[args.facets]
+
+    # 모델/인덱스 로딩 시간이 첫 설정의 지연 시간에 섞이지 않도록 한 번 예열
+    hybrid_search(golden[0]["query"], top_k=args.k, save_history=False)
+
+    reports = []
+    for bm25_weight, min_score, use_facets in itertools.product(
+            parse_floats(args.bm25_weights), parse_floats(args.min_scores), facet_options):
+        reports.append(evaluate_config(golden, args.k, bm25_weight, min_score, use_facets))
+
+    print_report(reports, args.k)
+
+    if args.min_recall is not None:
+        passing = [r for r in reports if r[f"recall@{args.k}"] >= args.min_recall]
+        if passing:
+            best = min(passing, key=lambda r: r["latency_p95_ms"])
+            print(f"\n✅ recall@{args.k} ≥ {args.min_recall} 중 가장 빠른 설정: "
+                  f"BM25_WEIGHT={best['bm25_weight']}, cutoff={best['min_score']}, facets={best['use_facets']}")
+        else:
+            print(f"\n❌ recall@{args.k} ≥ {args.min_recall}을 만족하는 설정이 없습니다.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(reports, file, ensure_ascii=False, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+# 범주형 패싯 컬럼
+CATEGORICAL_FACETS = ["이수구분", "개설학기", "과제", "조모임", "시험", "출결"]
+RATING_FACET = "평점"
+RATING_STEPS = np.arange(0.0, 5.01, 0.5)  # 평점 ≥ t 비트마스크를 미리 만들어 둘 기준값
+
+# 이수구분 약어 ↔ 정식 명칭
+COURSE_TYPE_ALIASES = {
+    "전필": "전공필수", "전선": "전공선택",
+    "교필": "교양필수", "교선": "교양선택",
+}
+
+# 질의에서 패싯을 가리키는 표현
+FACET_KEYWORDS = {
+    "과제": ["과제", "레포트", "리포트"],
+    "조모임": ["조모임", "팀플", "팀프로젝트", "팀 프로젝트"],
+    "시험": ["시험"],
+    "출결": ["출결", "출석"],
+}
+
+# 패싯 표현 뒤에 오는 정도 표현 → 값에 포함된 문자열
+FACET_LEVEL_PATTERNS = [
+    (re.compile(r"^\s*(이|가|은|는)?\s*(없|안\s*(하|보|내|부르))"), ["없", "안함"]),
+    (re.compile(r"^\s*(이|가|은|는)?\s*많"), ["많"]),
+    (re.compile(r"^\s*(이|가|은|는)?\s*(적|보통)"), ["보통", "적"]),
+]
+
+RATING_PATTERN = re.compile(r"평점\s*(?:이|가|은|는)?\s*(\d(?:\.\d+)?)\s*점?\s*(이상|초과|이하|미만)")
+SEMESTER_PATTERN = re.compile(r"([12])\s*학기")
+
+
+# 행 집합을 비트마스크(np.packbits)로 보관하는 패싯 인덱스
+class FacetIndex:
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        self.values = {}
+        self.masks = {}
+        for column in CATEGORICAL_FACETS:
+            if column not in df.columns:
+                continue
+            series = df[column].astype(str).str.strip()
+            valid = df[column].notna().to_numpy()
+            self.masks[column] = {}
+            for value in series[valid].unique():
+                self.masks[column][value] = self._pack((series == value).to_numpy() & valid)
+            self.values[column] = list(self.masks[column])
+
+        self.ratings = None
+        self.rating_masks = {}
+        if RATING_FACET in df.columns:
+            self.ratings = pd.to_numeric(df[RATING_FACET], errors="coerce").to_numpy(dtype=float)
+            for step in RATING_STEPS:
+                self.rating_masks[round(float(step), 1)] = self._pack(self.ratings >= step)
+
+    def _pack(self, mask: np.ndarray) -> np.ndarray:
+        return np.packbits(mask.astype(bool))
+
+    def all_mask(self) -> np.ndarray:
+        return self._pack(np.ones(self.size, dtype=bool))
+
+    def value_mask(self, column, values) -> np.ndarray:
+        mask = np.zeros_like(self.all_mask())
+        for value in values:
+            if value in self.masks.get(column, {}):
+                mask |= self.masks[column][value]
+        return mask
+
+    def rating_mask(self, op, threshold) -> np.ndarray:
+        key = round(float(threshold), 1)
+        if op == "이상" and key == threshold and key in self.rating_masks:
+            return self.rating_masks[key]
+        if op == "이상":
+            return self._pack(self.ratings >= threshold)
+        if op == "초과":
+            return self._pack(self.ratings > threshold)
+        if op == "이하":
+            return self._pack(self.ratings <= threshold)
+        return self._pack(self.ratings < threshold)
+
+    # 필터(컬럼 → 허용 값 목록, 평점 → (연산, 기준값))를 만족하는 행 번호
+    def candidates(self, filters: dict) -> np.ndarray:
+        mask = self.all_mask()
+        for column, condition in filters.items():
+            if column == RATING_FACET:
+                if self.ratings is not None:
+                    mask &= self.rating_mask(*condition)
+            else:
+                mask &= self.value_mask(column, condition)
+        return np.flatnonzero(np.unpackbits(mask, count=self.size))
+
+
+# 질의에서 패싯 필터 추출
+def extract_filters(query: str, facet_index: FacetIndex) -> dict:
+    filters = {}
+
+    # 이수구분: 데이터에 있는 값 또는 약어/정식 명칭이 질의에 포함된 경우
+    course_types = []
+    for value in facet_index.values.get("이수구분", []):
+        names = {value}
+        for short, full in COURSE_TYPE_ALIASES.items():
+            if value in (short, full):
+                names.update((short, full))
+        if any(name in query for name in names):
+            course_types.append(value)
+    if course_types:
+        filters["이수구분"] = course_types
+
+    # 개설학기: "1학기", "2학기"
+    semester = SEMESTER_PATTERN.search(query)
+    if semester:
+        matched = [v for v in facet_index.values.get("개설학기", []) if semester.group(1) in v]
+        if matched:
+            filters["개설학기"] = matched
+
+    # 과제/조모임/시험/출결: "과제 없는", "팀플 많은" 등
+    for column, keywords in FACET_KEYWORDS.items():
+        for keyword in keywords:
+            position = query.find(keyword)
+            if position < 0:
+                continue
+            following = query[position + len(keyword):]
+            for pattern, markers in FACET_LEVEL_PATTERNS:
+                if pattern.search(following):
+                    matched = [v for v in facet_index.values.get(column, []) if any(m in v for m in markers)]
+                    if matched:
+                        filters[column] = matched
+                    break
+            break
+
+    # 평점 범위: "평점 4 이상", "평점 3.5점 미만"
+    rating = RATING_PATTERN.search(query)
+    if rating and facet_index.ratings is not None:
+        filters[RATING_FACET] = (rating.group(2), float(rating.group(1)))
+
+    return filters
+
+
+# 데이터셋 파일이 바뀔 때만 다시 만드는 패싯 인덱스 캐시
+_facet_cache = {}
+_facet_cache_lock = threading.Lock()
+
+def get_facet_index(df: pd.DataFrame, dataset_path: str) -> FacetIndex:
+    try:
+        version = (dataset_path, os.path.getmtime(dataset_path), len(df))
+    except OSError:
+        version = (dataset_path, None, len(df))
+    with _facet_cache_lock:
+        facet_index = _facet_cache.get("index")
+        if facet_index is None or _facet_cache.get("version") != version:
+            logging.info("🔹 Building facet index")
+            facet_index = FacetIndex(df)
+            _facet_cache["index"] = facet_index
+            _facet_cache["version"] = version
+        return facet_index
+
+__all__ = ["FacetIndex", "extract_filters", "get_facet_index"]
@@ -1,15 +1,23 @@
 import os
 import pandas as pd
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from openai import OpenAI
+from typing import Optional
+from openai import OpenAI, OpenAIError
 import traceback
+import logging
+import threading
+import uuid
 import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 from backend.config import OPENAI_API_KEY, DATASET_PATH
 from backend.search import hybrid_search
+from backend.admission import llm_admission, LLMOverloadedError, LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE
 from backend.chat_history import (
-    load_chat_history, add_to_chat_history,
+    load_chat_history, add_to_chat_history, update_chat_turn, chat_history_view,
     load_previous_search_results, add_search_results_to_history
 )
 
@@ -22,6 +30,20 @@ if not OPENAI_API_KEY:
     raise ValueError("OpenAI API 키가 설정되지 않았습니다.")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# 응답 마감 시간(초): 이 시간 안에 GPT 응답이 없으면 검색 결과 요약으로 먼저 응답 (0 이하이면 끝까지 대기)
+ANSWER_DEADLINE = float(os.getenv("ANSWER_DEADLINE", "8"))
+LATE_ANSWER_CACHE_SIZE = 100
+
+# GPT 호출 전용 스레드 풀 (동시 실행 수는 llm_admission이 제한)
+# 제출 수를 작업자 수로 묶어 스레드 풀 내부 큐에 요청이 쌓이지 않게 함
+LLM_WORKERS = LLM_MAX_CONCURRENCY + LLM_MAX_QUEUE
+llm_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="gpt")
+llm_submit_slots = threading.BoundedSemaphore(LLM_WORKERS)
+
+# 마감 이후 도착한 GPT 응답 보관 (answer_id → 상태)
+_late_answers = OrderedDict()
+_late_answers_lock = threading.Lock()
+
 # 데이터 불러오기
 COURSE_DF = pd.read_csv(DATASET_PATH, encoding="utf-8-sig")
 LECTURE_LIST = COURSE_DF["강의명"].dropna().unique().tolist()
@@ -154,29 +176,32 @@ def build_prompt(context, query, mode, last_q="", last_a="", lecture="", profess
         - 항상 정중하고 따뜻한 말투로, 친절하고 부드럽게 안내해주세요.
         """
 
-# GPT 응답 생성
-def generate_answer(query: str):
-    try:
-        last_q, last_a = get_last_turn()
-        last_lecture = get_last_lecture_name()
-        last_professor = get_last_professor_name()
-
-        if is_follow_up_to_lecture(query) and (last_lecture or last_professor):
-            if last_professor:
-                matched = load_previous_search_results()
-                context = "\n\n".join(format_course_info(c) for c in matched)
-                prompt = build_prompt(context, query, mode="professor_followup", last_q=last_q, last_a=last_a, professor=last_professor)
-            else:
-                matched = load_previous_search_results()
-                context = "\n\n".join(format_course_info(c) for c in matched)
-                prompt = build_prompt(context, query, mode="lecture_followup", last_q=last_q, last_a=last_a, lecture=last_lecture)
+# 질문 유형에 맞는 프롬프트와 참고한 강의 목록 구성
+def prepare_prompt(query: str):
+    last_q, last_a = get_last_turn()
+    last_lecture = get_last_lecture_name()
+    last_professor = get_last_professor_name()
+
+    if is_follow_up_to_lecture(query) and (last_lecture or last_professor):
+        if last_professor:
+            matched = load_previous_search_results()
+            context = "\n\n".join(format_course_info(c) for c in matched)
+            prompt = build_prompt(context, query, mode="professor_followup", last_q=last_q, last_a=last_a, professor=last_professor)
         else:
-            matched = hybrid_search(query)
+            matched = load_previous_search_results()
             context = "\n\n".join(format_course_info(c) for c in matched)
-            prompt = build_prompt(context, query, mode="default")
-            add_search_results_to_history(query, matched)
+            prompt = build_prompt(context, query, mode="lecture_followup", last_q=last_q, last_a=last_a, lecture=last_lecture)
+    else:
+        matched = hybrid_search(query)
+        context = "\n\n".join(format_course_info(c) for c in matched)
+        prompt = build_prompt(context, query, mode="default")
+        add_search_results_to_history(query, matched)
+    return prompt, matched
 
-        response = client.chat.completions.create(
+# 재시도 없이 남은 시간만큼만 호출 (기본 재시도는 시도마다 timeout을 새로 받아 마감을 넘김)
+def call_gpt(prompt: str, deadline: float) -> str:
+    with llm_admission.slot(deadline) as remaining:
+        response = client.with_options(max_retries=0, timeout=remaining).chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "너는 광운대학교 전자공학과 강의 추천 챗봇이야."},
@@ -184,22 +209,118 @@ def generate_answer(query: str):
             ],
             temperature=0.7
         )
-        answer = response.choices[0].message.content.strip()
-        add_to_chat_history(query, answer)
-        return answer
+    return response.choices[0].message.content.strip()
+
+# LLM 없이 검색 결과만으로 만드는 고정 형식 요약
+def format_fallback_answer(matched) -> str:
+    if not matched:
+        return "지금은 답변 생성이 지연되고 있고, 질문과 관련된 강의를 찾지 못했습니다. 잠시 후 다시 질문해주세요."
+    lines = ["답변 생성이 지연되어 검색된 강의 정보를 먼저 안내드립니다."]
+    for course in matched:
+        lines.append(
+            f"\n• {clean_text_field(course.get('강의명'))} ({clean_text_field(course.get('교수명'))})"
+            f" - {clean_text_field(course.get('이수구분'))}, {clean_text_field(course.get('개설학기'))}"
+        )
+        lines.append(
+            f"  평점: {clean_text_field(course.get('평점'))} / 과제: {clean_text_field(course.get('과제'))}"
+            f" / 출결: {clean_text_field(course.get('출결'))} / 시험: {clean_text_field(course.get('시험'))}"
+        )
+    return "\n".join(lines)
+
+# 마감 이후 계속 진행 중인 GPT 호출을 등록하고, 끝나면 결과를 보관
+# 대화 기록의 요약 답변도 실제 응답으로 바꿔 후속 질문의 "이전 답변"으로 쓰이게 함
+def register_late_answer(future, turn_id) -> str:
+    answer_id = uuid.uuid4().hex
+    with _late_answers_lock:
+        _late_answers[answer_id] = {"status": "pending"}
+        while len(_late_answers) > LATE_ANSWER_CACHE_SIZE:
+            _late_answers.popitem(last=False)
+
+    def store(done):
+        try:
+            entry = {"status": "done", "response": done.result()}
+        except Exception as e:
+            entry = {"status": "failed", "detail": str(e)}
+        with _late_answers_lock:
+            if answer_id in _late_answers:
+                _late_answers[answer_id] = entry
+        if entry["status"] == "done":
+            update_chat_turn(turn_id, entry["response"])
 
+    future.add_done_callback(store)
+    return answer_id
+
+# 작업자가 비어 있을 때만 제출, 아니면 바로 과부하로 거절
+def submit_gpt(prompt: str, deadline: float):
+    if not llm_submit_slots.acquire(blocking=False):
+        raise llm_admission.reject_queue_full()
+    future = llm_executor.submit(call_gpt, prompt, deadline)
+    future.add_done_callback(lambda _: llm_submit_slots.release())
+    return future
+
+def get_late_answer(answer_id: str):
+    with _late_answers_lock:
+        entry = _late_answers.get(answer_id)
+        return dict(entry) if entry else None
+
+# GPT 응답 생성 (마감 시간 초과 또는 LLM 사용 불가 시 검색 결과 요약으로 대체)
+# 대화 기록은 여기서만 저장하고, since가 주어지면 그 이후의 새 대화를 함께 돌려줌
+def answer_query(query: str, since=None) -> dict:
+    deadline = llm_admission.new_deadline()
+    try:
+        prompt, matched = prepare_prompt(query)
+    except Exception as e:
+        traceback.print_exc()
+        return {"response": f"GPT 응답 생성 중 오류: {e}", **chat_history_view(since)}
+
+    try:
+        future = submit_gpt(prompt, deadline)
+        answer = future.result(timeout=ANSWER_DEADLINE if ANSWER_DEADLINE > 0 else None)
+    except FutureTimeoutError:
+        logging.warning(f"GPT 응답이 {ANSWER_DEADLINE}s 안에 오지 않아 검색 결과 요약으로 응답")
+        fallback = format_fallback_answer(matched)
+        history = add_to_chat_history(query, fallback)
+        return {"response": fallback, "fallback": True, "answer_id": register_late_answer(future, history[-1]["id"]),
+                **chat_history_view(since, history)}
+    except (OpenAIError, LLMOverloadedError) as e:
+        if ANSWER_DEADLINE <= 0:
+            if isinstance(e, LLMOverloadedError):
+                raise
+            traceback.print_exc()
+            return {"response": f"GPT 응답 생성 중 오류: {e}", **chat_history_view(since)}
+        logging.warning(f"GPT 사용 불가, 검색 결과 요약으로 응답: {e}")
+        fallback = format_fallback_answer(matched)
+        history = add_to_chat_history(query, fallback)
+        return {"response": fallback, "fallback": True, **chat_history_view(since, history)}
     except Exception as e:
         traceback.print_exc()
-        return f"GPT 응답 생성 중 오류: {e}"
+        return {"response": f"GPT 응답 생성 중 오류: {e}", **chat_history_view(since)}
+
+    history = add_to_chat_history(query, answer)
+    return {"response": answer, **chat_history_view(since, history)}
+
+def generate_answer(query: str):
+    return answer_query(query)["response"]
 
 # FastAPI endpoint
 class Query(BaseModel):
     query: str
+    since: Optional[int] = None  # 이 턴 id 이후의 대화만 응답에 포함
 
 @gpt_router.post("/")
 async def chat(query: Query):
     try:
-        return {"response": generate_answer(query.query)}
+        return await run_in_threadpool(answer_query, query.query, query.since)
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"서버 오류: {str(e)}")
+
+# 마감 이후 도착한 GPT 응답 조회
+@gpt_router.get("/late/{answer_id}")
+async def late_answer(answer_id: str):
+    entry = get_late_answer(answer_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="해당 응답을 찾을 수 없습니다.")
+    return entry
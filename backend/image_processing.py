@@ -0,0 +1,252 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+
+image_router = APIRouter()
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+DAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+# 격자선/채움 판정 기준값 (밝기 기준은 이미지 배경 밝기에서 뺀 값)
+LINE_CONTRAST = 12             # 배경보다 이만큼 이상 어두운 무채색 픽셀을 선 후보로 간주 (연회색 격자 포함)
+LINE_COVERAGE_RATIO = 0.6      # 행/열의 60% 이상이 어두우면 격자선
+FILL_SATURATION_THRESHOLD = 40 # 채도(max-min)가 이 값 이상이면 강의 블록 색상
+FILL_CONTRAST = 35             # 배경보다 이만큼 이상 어두우면 채워진 픽셀
+CELL_OCCUPIED_RATIO = 0.3      # 셀 내부의 30% 이상이 채워져 있으면 수업 있음
+CELL_MARGIN_RATIO = 0.15       # 격자선/테두리를 피하기 위해 셀 가장자리를 잘라냄
+
+# 이미지 내용 해시 기반 결과 캐시 (detect_empty_slots → recommend 재업로드 시 재사용)
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "64"))
+_slot_cache = OrderedDict()
+_slot_cache_lock = threading.Lock()
+
+
+def image_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def load_image_array(image_bytes: bytes) -> np.ndarray:
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        return np.asarray(img.convert("RGB"), dtype=np.int16)
+
+# 연속된 선 인덱스를 하나의 선(중심 좌표)으로 병합
+def merge_line_positions(indices: np.ndarray) -> np.ndarray:
+    if len(indices) == 0:
+        return indices
+    breaks = np.flatnonzero(np.diff(indices) > 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(indices)]))
+    groups = np.add.reduceat(indices, starts)
+    return (groups // (ends - starts)).astype(np.int64)
+
+# 투영 프로파일에서 선 위치 검출
+def profile_lines(dark: np.ndarray, axis: int) -> np.ndarray:
+    return merge_line_positions(np.flatnonzero(dark.mean(axis=axis) >= LINE_COVERAGE_RATIO))
+
+# 강의 블록에 가려 빠진 선을 가장 좁은 간격(한 교시 높이)에 맞춰 채워 넣음 (첫 칸은 머리글)
+def fill_missing_lines(lines: np.ndarray) -> np.ndarray:
+    if len(lines) < 3:
+        return lines
+    gaps = np.diff(lines[1:])
+    pitch = gaps.min()
+    if pitch <= 0:
+        return lines
+    counts = np.maximum(np.rint(gaps / pitch).astype(np.int64), 1)
+    filled = [lines[0], lines[1]]
+    for start, gap, count in zip(lines[1:-1], gaps, counts):
+        filled.extend(start + np.rint(np.arange(1, count + 1) * gap / count).astype(np.int64))
+    return np.array(filled, dtype=np.int64)
+
+# 배경 밝기: 강의 블록(유채색)을 제외한 픽셀의 중앙값
+def background_level(gray: np.ndarray, saturation: np.ndarray) -> float:
+    achromatic = gray[saturation < FILL_SATURATION_THRESHOLD]
+    return float(np.median(achromatic)) if achromatic.size else float(np.median(gray))
+
+# 행/열 투영으로 격자선 검출 (배경보다 어두운 무채색 픽셀만 선으로 간주)
+# 교시 구분선은 블록에 가려지지 않는 첫 열(교시 머리글)에서도 찾고, 빠진 선은 간격으로 보충
+def detect_grid_lines(gray: np.ndarray, saturation: np.ndarray, background: float):
+    dark = (gray < background - LINE_CONTRAST) & (saturation < FILL_SATURATION_THRESHOLD)
+    cols = profile_lines(dark, axis=0)
+    rows = profile_lines(dark, axis=1)
+    if len(cols) >= 2 and cols[1] - cols[0] > 2:
+        header_rows = profile_lines(dark[:, cols[0] + 1:cols[1]], axis=1)
+        rows = merge_line_positions(np.unique(np.concatenate((rows, header_rows))))
+    return fill_missing_lines(rows), fill_missing_lines(cols)
+
+# 적분 영상으로 모든 셀의 채움 비율을 한 번에 계산
+def cell_fill_ratios(filled: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    integral = np.zeros((filled.shape[0] + 1, filled.shape[1] + 1), dtype=np.int64)
+    integral[1:, 1:] = filled.cumsum(axis=0).cumsum(axis=1)
+
+    row_margin = ((rows[1:] - rows[:-1]) * CELL_MARGIN_RATIO).astype(np.int64)
+    col_margin = ((cols[1:] - cols[:-1]) * CELL_MARGIN_RATIO).astype(np.int64)
+    top, bottom = rows[:-1] + row_margin + 1, rows[1:] - row_margin
+    left, right = cols[:-1] + col_margin + 1, cols[1:] - col_margin
+    bottom = np.maximum(bottom, top + 1)
+    right = np.maximum(right, left + 1)
+
+    t, b = top[:, None], bottom[:, None]
+    l, r = left[None, :], right[None, :]
+    sums = integral[b, r] - integral[t, r] - integral[b, l] + integral[t, l]
+    areas = (b - t) * (r - l)
+    return sums / areas
+
+# 시간표 이미지에서 빈 시간 검출 (첫 행: 요일, 첫 열: 교시, 격자를 못 찾으면 빈 dict)
+def detect_empty_slots(image_bytes: bytes) -> dict:
+    rgb = load_image_array(image_bytes)
+    gray = rgb.mean(axis=2)
+    saturation = rgb.max(axis=2) - rgb.min(axis=2)
+    background = background_level(gray, saturation)
+    filled = (saturation >= FILL_SATURATION_THRESHOLD) | (gray < background - FILL_CONTRAST)
+
+    rows, cols = detect_grid_lines(gray, saturation, background)
+    if len(rows) < 3 or len(cols) < 3:
+        logging.warning("시간표 격자를 찾지 못했습니다.")
+        return {}
+
+    ratios = cell_fill_ratios(filled, rows, cols)[1:, 1:]
+    occupied = ratios >= CELL_OCCUPIED_RATIO
+
+    free_slots = {}
+    for day_idx, day in enumerate(DAYS[:occupied.shape[1]]):
+        free_periods = np.flatnonzero(~occupied[:, day_idx]) + 1
+        free_slots[day] = [f"{period}교시" for period in free_periods]
+    return free_slots
+
+# 캐시를 거치는 검출 (recommend 등 다른 라우터에서도 사용, 격자 검출 실패는 캐시하지 않음)
+def detect_empty_slots_cached(image_bytes: bytes) -> dict:
+    key = image_hash(image_bytes)
+    with _slot_cache_lock:
+        if key in _slot_cache:
+            _slot_cache.move_to_end(key)
+            logging.info("시간표 분석 캐시 적중")
+            return {day: list(times) for day, times in _slot_cache[key].items()}
+
+    free_slots = detect_empty_slots(image_bytes)
+    if not free_slots:
+        return {}
+
+    with _slot_cache_lock:
+        _slot_cache[key] = free_slots
+        _slot_cache.move_to_end(key)
+        while len(_slot_cache) > IMAGE_CACHE_SIZE:
+            _slot_cache.popitem(last=False)
+    return {day: list(times) for day, times in free_slots.items()}
+
+def clear_slot_cache():
+    with _slot_cache_lock:
+        _slot_cache.clear()
+
+# API 엔드포인트
+@image_router.post("/detect_empty_slots")
+async def detect_empty_slots_endpoint(file: UploadFile = File(...)):
+    try:
+        image_bytes = await file.read()
+        free_slots = await run_in_threadpool(detect_empty_slots_cached, image_bytes)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"이미지 처리 오류: {str(e)}")
+    if not free_slots:
+        raise HTTPException(status_code=422, detail="시간표 격자를 찾지 못했습니다. 시간표 전체가 보이는 이미지를 올려주세요.")
+    return {"free_slots": free_slots}
+
+
+# 합성 시간표 이미지 생성 (벤치마크용)
+# 실제 시간표처럼 격자를 먼저 그리고, 여러 교시에 걸친 강의 블록이 그 위를 덮음
+def make_synthetic_timetable(blocks, n_periods, n_days, cell_w=80, cell_h=50, header_w=60, header_h=40,
+                             line_color=(120, 120, 120)):
+    from PIL import ImageDraw
+
+    width = header_w + cell_w * n_days + 1
+    height = header_h + cell_h * n_periods + 1
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    palette = [(244, 143, 177), (129, 199, 132), (100, 181, 246), (255, 213, 79), (186, 104, 200)]
+
+    xs = [0, header_w] + [header_w + cell_w * (d + 1) for d in range(n_days)]
+    ys = [0, header_h] + [header_h + cell_h * (p + 1) for p in range(n_periods)]
+    for x in xs:
+        draw.line([(x, 0), (x, height - 1)], fill=line_color, width=1)
+    for y in ys:
+        draw.line([(0, y), (width - 1, y)], fill=line_color, width=1)
+
+    for n, (day, start, end) in enumerate(blocks):
+        x0 = header_w + day * cell_w
+        y0 = header_h + start * cell_h
+        draw.rectangle([x0 + 1, y0 + 1, x0 + cell_w - 1, header_h + end * cell_h - 1], fill=palette[n % len(palette)])
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+# 요일마다 1~3교시 길이의 겹치지 않는 블록을 무작위로 배치
+def random_blocks(rng, n_periods, n_days):
+    blocks = []
+    occupied = np.zeros((n_periods, n_days), dtype=bool)
+    for day in range(n_days):
+        period = int(rng.integers(0, 2))
+        while period < n_periods:
+            length = int(rng.integers(1, 4))
+            if rng.random() < 0.5:
+                end = min(period + length, n_periods)
+                blocks.append((day, period, end))
+                occupied[period:end, day] = True
+                period = end
+            period += int(rng.integers(1, 3))
+    return blocks, occupied
+
+# 격자선 색: 진한 회색과 실제 시간표 캡처에 흔한 연회색
+BENCHMARK_LINE_COLORS = [(120, 120, 120), (210, 210, 210), (225, 225, 225)]
+
+def run_benchmark(n_images=20, n_periods=9, n_days=5, seed=0):
+    rng = np.random.default_rng(seed)
+    fixtures = []
+    for line_color in BENCHMARK_LINE_COLORS:
+        for _ in range(n_images):
+            blocks, occupied = random_blocks(rng, n_periods, n_days)
+            fixtures.append((make_synthetic_timetable(blocks, n_periods, n_days, line_color=line_color), occupied))
+        # 월~목 1~3교시를 한 블록이 덮는 경우 (교시 구분선이 대부분 가려짐)
+        wide_blocks = [(day, 0, 3) for day in range(min(4, n_days))]
+        wide_occupied = np.zeros((n_periods, n_days), dtype=bool)
+        wide_occupied[0:3, :min(4, n_days)] = True
+        fixtures.append((make_synthetic_timetable(wide_blocks, n_periods, n_days, line_color=line_color), wide_occupied))
+
+    clear_slot_cache()
+    correct, total, failed = 0, 0, 0
+    cold, warm = [], []
+    for image_bytes, occupied in fixtures:
+        start = time.perf_counter()
+        free_slots = detect_empty_slots_cached(image_bytes)
+        cold.append(time.perf_counter() - start)
+        failed += not free_slots
+
+        start = time.perf_counter()
+        detect_empty_slots_cached(image_bytes)
+        warm.append(time.perf_counter() - start)
+
+        for d, day in enumerate(DAYS[:n_days]):
+            free = set(free_slots.get(day, []))
+            for p in range(n_periods):
+                predicted_occupied = f"{p + 1}교시" not in free
+                correct += predicted_occupied == bool(occupied[p, d])
+                total += 1
+
+    print(f"셀 정확도: {correct / total:.4f} ({correct}/{total}), 격자 검출 실패: {failed}/{len(fixtures)}")
+    print(f"최초 분석 평균: {np.mean(cold) * 1000:.2f} ms / p95: {np.percentile(cold, 95) * 1000:.2f} ms")
+    print(f"캐시 적중 평균: {np.mean(warm) * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    run_benchmark()
+
+__all__ = ["image_router", "detect_empty_slots", "detect_empty_slots_cached"]
@@ -5,6 +5,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pandas as pd
 import ollama
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import re
 
@@ -14,6 +15,7 @@ from backend.chat_history import (
     add_search_results_to_history, load_previous_search_results
 )
 from backend.config import DATASET_PATH
+from backend.admission import llm_admission, LLMOverloadedError
 
 llm_router = APIRouter()
 
@@ -71,8 +73,18 @@ def get_last_professor_name_from_chat():
                 return professor
     return None
 
+# 동시 실행 제한을 거쳐 EEVE 모델 호출 (마감까지 남은 시간을 호출 제한 시간으로 사용)
+def chat_with_ollama(prompt, deadline):
+    with llm_admission.slot(deadline) as remaining:
+        response = ollama.Client(timeout=remaining).chat(model='eeve-korean:latest', messages=[
+            {"role": "system", "content": "너는 광운대학교 전자공학과 강의 추천 챗봇이야."},
+            {"role": "user", "content": prompt}
+        ])
+    return response["message"]["content"].strip()
+
 # 핵심 함수: 답변 생성
 def generate_answer(query, previous_results=[]):
+    deadline = llm_admission.new_deadline()
     try:
         # 1. 정확한 강의명 직접 검색
         if query in LECTURE_LIST:
@@ -107,11 +119,7 @@ def generate_answer(query, previous_results=[]):
             - 제공된 정보 외 내용은 추측하지 말아주세요.
             - 답변은 자연스럽고 간결하게 제공해주세요.
             """
-            response = ollama.chat(model='eeve-korean:latest', messages=[
-                {"role": "system", "content": "너는 광운대학교 전자공학과 강의 추천 챗봇이야."},
-                {"role": "user", "content": prompt}
-            ])
-            return response["message"]["content"].strip()
+            return chat_with_ollama(prompt, deadline)
 
         # 3. 후속 질문 (교수 기반)
         if is_follow_up_to_lecture(query):
@@ -140,11 +148,7 @@ def generate_answer(query, previous_results=[]):
                 - 친절하고 섬세히 알려주세요.
                 - 답변은 너무 길지 않게, 자연스럽게 작성해 주세요.
                 """
-                response = ollama.chat(model='eeve-korean:latest', messages=[
-                    {"role": "system", "content": "너는 광운대학교 전자공학과 강의 추천 챗봇이야."},
-                    {"role": "user", "content": prompt}
-                ])
-                return response["message"]["content"].strip()
+                return chat_with_ollama(prompt, deadline)
 
         # 4. 후속 질문 (강의 기반)
         if is_follow_up_to_lecture(query):
@@ -172,11 +176,7 @@ def generate_answer(query, previous_results=[]):
                 - 친절하고 섬세히 알려주세요.
                 - 답변은 너무 길지 않게, 자연스럽게 작성해 주세요.
                 """
-                response = ollama.chat(model='eeve-korean:latest', messages=[
-                    {"role": "system", "content": "너는 광운대학교 전자공학과 강의 추천 챗봇이야."},
-                    {"role": "user", "content": prompt}
-                ])
-                return response["message"]["content"].strip()
+                return chat_with_ollama(prompt, deadline)
 
         # 5. 일반 자연어 검색 (hybrid_search)
         search_results = hybrid_search(query)
@@ -202,12 +202,10 @@ def generate_answer(query, previous_results=[]):
         - 제공된 정보 외 내용은 추측하지 말아주세요.
         - 답변은 자연스럽고 간결하게 제공해주세요.
         """
-        response = ollama.chat(model='eeve-korean:latest', messages=[
-            {"role": "system", "content": "너는 광운대학교 전자공학과 강의 추천 챗봇이야."},
-            {"role": "user", "content": prompt}
-        ])
-        return response["message"]["content"].strip()
+        return chat_with_ollama(prompt, deadline)
 
+    except LLMOverloadedError:
+        raise
     except Exception as e:
         return f"Ollama 로컬 모델 호출 오류: {e}"
 
@@ -219,8 +217,10 @@ class Query(BaseModel):
 async def chat_endpoint(query: Query):
     try:
         previous_results = load_previous_search_results()
-        answer = generate_answer(query.query, previous_results)
+        answer = await run_in_threadpool(generate_answer, query.query, previous_results)
         add_to_chat_history(query.query, answer)
         return {"answer": answer}
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"서버 오류 발생: {str(e)}")
@@ -1,23 +1,36 @@
 import sys
 import os
 import logging
+from contextlib import asynccontextmanager
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from backend.search import search_router
+from backend.search import search_router, get_embedding_model
+from backend.shards import get_shard_router
 # from backend.local_myllm import llm_router
 from backend.gpt import gpt_router  # GPT-3.5 Turbo
 from backend.recommend import recommend_router
 from backend.image_processing import image_router
 from backend.chain import chat_router
+from backend.admission import llm_admission
 
 # 로깅
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="광운대학교 챗봇 API", version="1.0")
+# 첫 검색 요청이 모델/샤드 로딩을 기다리지 않도록 서버 시작 시 미리 불러옴
+# (모델을 인코딩 배치 작업자 안에서 처음 불러오면 첫 인코딩이 DENSE_TIMEOUT을 넘길 수 있음)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(get_embedding_model)
+    await run_in_threadpool(get_shard_router)
+    yield
+
+app = FastAPI(title="광운대학교 챗봇 API", version="1.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # CORS 설정
 app.add_middleware(
@@ -41,6 +54,11 @@ app.include_router(chat_router, prefix="/api/chat")
 async def health_check():
     return {"status": "OK"}
 
+# LLM 대기열/동시 실행 지표
+@app.get("/api/metrics/llm")
+async def llm_metrics():
+    return llm_admission.metrics()
+
 # 프론트엔드 정적 파일 제공 (Next.js 정적 사이트)
 app.mount("/", StaticFiles(directory="frontend/out", html=True), name="static")
 
@@ -7,15 +7,41 @@ import numpy as np
 import pickle
 import pandas as pd
 import logging
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from sentence_transformers import SentenceTransformer
 from rank_bm25 import BM25Okapi
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from backend.config import FAISS_INDEX_PATH, BM25_INDEX_PATH, DATASET_PATH, FAISS_TOP_K, BM25_WEIGHT
 from backend.chat_history import add_search_results_to_history
+from backend.facets import get_facet_index, extract_filters
+from backend.batch_encoder import EncodeBatcher
+from backend.shards import get_shard_router, shard_bm25_scores
 
 search_router = APIRouter()
 
+MIN_SCORE = 0.5  # 결합 점수 하한 (이보다 낮은 결과는 제외)
+
+# 검색 병렬화 설정 (dense: 임베딩+FAISS, sparse: BM25)
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "16"))
+DENSE_TIMEOUT = float(os.getenv("DENSE_TIMEOUT", "5.0"))
+SPARSE_TIMEOUT = float(os.getenv("SPARSE_TIMEOUT", "5.0"))
+SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "5.0"))
+EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# FAISS 검색과 torch 연산은 GIL을 놓으므로 스레드 풀에서 두 검색기가 실제로 겹쳐 실행됨
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="hybrid-search")
+
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+
+# 카탈로그 CSV는 파일이 바뀔 때만 다시 읽음
+_dataset_cache = {}
+_dataset_lock = threading.Lock()
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # 1. 쿼리 분류 함수
@@ -43,11 +69,25 @@ def load_dataset():
         logging.error(f"Dataset load failed: {e}")
         return None
 
+def get_dataset():
+    try:
+        version = os.path.getmtime(DATASET_PATH)
+    except OSError:
+        version = None
+    with _dataset_lock:
+        if _dataset_cache.get("df") is None or _dataset_cache.get("version") != version:
+            _dataset_cache["df"] = load_dataset()
+            _dataset_cache["version"] = version
+        return _dataset_cache["df"]
+
 def search_course_directly(query, df):
     filtered_df = df[df["강의명"] == query]
     if filtered_df.empty:
         return None
-    course_info = filtered_df.iloc[0]
+    return course_summary(filtered_df.iloc[0])
+
+# 강의명을 직접 입력했을 때의 응답 형식
+def course_summary(course_info):
     return [{
         "강의명": course_info["강의명"],
         "교수명": course_info["교수명"],
@@ -74,78 +114,240 @@ def normalize_scores(scores):
     max_score = np.max(scores)
     return (scores - min_score) / (max_score - min_score + 1e-8) if max_score - min_score > 1e-8 else np.ones_like(scores)
 
-# 핵심 함수: 하이브리드 검색 + 쿼리 유형별 텍스트 구성
-def hybrid_search(query, top_k=FAISS_TOP_K):
-    logging.info(f"\n Searching for: '{query}'")
-    df = load_dataset()
-    if df is None:
-        logging.error("데이터 로드 실패, 검색 중단")
-        return []
-
-    direct_course_result = search_course_directly(query, df)
-    if direct_course_result:
-        logging.info("강의명을 직접 입력하여 CSV에서 검색 완료!")
-        add_search_results_to_history(query, direct_course_result)
-        return direct_course_result
+def get_embedding_model():
+    global _embedding_model
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            logging.info(f"🔹 Loading embedding model: {EMBEDDING_MODEL_NAME}")
+            _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        return _embedding_model
 
-    # 질의 유형 분류
-    query_type = classify_query_type(query)
-    logging.info(f"질의 유형: {query_type}")
+# 동시 검색 요청의 쿼리 인코딩을 배치로 묶음
+query_encoder = EncodeBatcher(get_embedding_model)
 
-    # 검색 텍스트 구성 (질의 유형별)
-    combined_texts = [get_combined_text(row, query_type) for _, row in df.iterrows()]
-    bm25 = BM25Okapi([doc.split() for doc in combined_texts])
-
-    # 임베딩 & FAISS 검색
-    embedding_model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
-    query_vector = embedding_model.encode([query]).astype('float32')
+# dense 검색: 쿼리 임베딩 + FAISS (후보 행 순서의 점수 배열 반환)
+def dense_scores(query, candidates, n_rows, restrict):
+    query_vector = query_encoder.encode(query, timeout=DENSE_TIMEOUT).reshape(1, -1)
     faiss_index = load_faiss_index()
     if faiss_index is None:
-        return []
+        raise RuntimeError("FAISS 인덱스를 불러오지 못했습니다.")
 
     faiss.normalize_L2(query_vector)
-    D, I = faiss_index.search(query_vector, len(df))
+    if restrict:
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(candidates.astype('int64')))
+        D, I = faiss_index.search(query_vector, len(candidates), params=params)
+    else:
+        D, I = faiss_index.search(query_vector, n_rows)
 
-    # BM25 검색
-    tokenized_query = query.split()
-    bm25_scores = np.array(bm25.get_scores(tokenized_query))
+    scores = np.zeros(n_rows)
+    valid = I[0] >= 0
+    scores[I[0][valid]] = D[0][valid]
+    return scores[candidates]
 
-    # 점수 정규화 & 결합
-    faiss_scores = np.zeros(len(df))
-    faiss_scores[I[0]] = D[0]
-    faiss_norm = normalize_scores(faiss_scores)
-    bm25_norm = normalize_scores(bm25_scores)
-    combined_scores = (1 - BM25_WEIGHT) * faiss_norm + BM25_WEIGHT * bm25_norm
+# sparse 검색: 질의 유형별 텍스트로 BM25 구성 후 점수 계산
+def sparse_scores(query, candidate_df, query_type):
+    combined_texts = [get_combined_text(row, query_type) for _, row in candidate_df.iterrows()]
+    bm25 = BM25Okapi([doc.split() for doc in combined_texts])
+    return np.array(bm25.get_scores(query.split()))
 
-    # 상위 결과 추출
-    top_indices = np.argsort(combined_scores)[::-1]
-    search_results = []
+def timed_branch(name, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        logging.info(f"⏱ {name} 검색: {(time.perf_counter() - start) * 1000:.1f} ms")
 
-    for idx in top_indices:
+# 제출 시점부터 제한 시간 안에 끝나지 않거나 실패한 검색기는 None으로 처리
+def wait_branch(name, future, started, timeout):
+    try:
+        return future.result(timeout=max(0.0, started + timeout - time.perf_counter()))
+    except FutureTimeoutError:
+        logging.warning(f"{name} 검색 시간 초과 ({timeout}s)")
+    except Exception as e:
+        logging.error(f"{name} 검색 실패: {e}")
+    return None
+
+# 점수 정규화 & 결합 (한쪽이 실패하면 남은 검색기 결과만 사용, 둘 다 실패하면 None)
+def fuse_scores(faiss_scores, bm25_scores, bm25_weight):
+    if faiss_scores is not None and bm25_scores is not None:
+        return (1 - bm25_weight) * normalize_scores(faiss_scores) + bm25_weight * normalize_scores(bm25_scores)
+    if faiss_scores is not None:
+        logging.warning("BM25 결과 없음 → FAISS 단독 결과 사용")
+        return normalize_scores(faiss_scores)
+    if bm25_scores is not None:
+        logging.warning("FAISS 결과 없음 → BM25 단독 결과 사용")
+        return normalize_scores(bm25_scores)
+    logging.error("FAISS, BM25 모두 실패")
+    return None
+
+# 점수 하한을 넘는 상위 행을 (점수, 행) 목록으로
+def top_rows(df, candidates, combined_scores, top_k, min_score):
+    scored = []
+    for idx in np.argsort(combined_scores)[::-1]:
         score = combined_scores[idx]
-        if score < 0.5 or len(search_results) >= top_k: #점수 필터링
+        if score < min_score or len(scored) >= top_k: #점수 필터링
             continue
-        row = df.iloc[idx]
-        search_results.append({
-            "학과": row["학과"],
-            "강의명": row["강의명"],
-            "개설학기": row["개설학기"],
-            "교수명": row["교수명"],
-            "평점": row["평점"],
-            "과제": row["과제"],
-            "조모임": row["조모임"],
-            "성적": row["성적"],
-            "출결": row["출결"],
-            "시험": row["시험"],
-            "학정번호": row["학정번호"],
-            "이수구분": row["이수구분"], #추가
-            "강의구성": row["강의구성"],
-            "강의시간": row["강의시간"],
-            "교과목개요": row["교과목개요"][:150],
-            "점수": round(float(score), 4)
-        })
-
-    if search_results:
+        scored.append((float(score), df.iloc[candidates[idx]]))
+    return scored
+
+def to_search_result(row, score):
+    return {
+        "학과": row["학과"],
+        "강의명": row["강의명"],
+        "개설학기": row["개설학기"],
+        "교수명": row["교수명"],
+        "평점": row["평점"],
+        "과제": row["과제"],
+        "조모임": row["조모임"],
+        "성적": row["성적"],
+        "출결": row["출결"],
+        "시험": row["시험"],
+        "학정번호": row["학정번호"],
+        "이수구분": row["이수구분"], #추가
+        "강의구성": row["강의구성"],
+        "강의시간": row["강의시간"],
+        "교과목개요": row["교과목개요"][:150],
+        "점수": round(float(score), 4)
+    }
+
+# 학과 샤드 하나 검색: 후보 행과 샤드 간 비교 가능한 원점수(코사인, 전체 통계 BM25)를 반환
+def search_shard(router, shard, query, query_type, query_vector, filters):
+    if filters:
+        candidates = shard.facet_index.candidates(filters)
+        if len(candidates) == 0:
+            return candidates, None, np.zeros(0)
+    else:
+        candidates = np.arange(len(shard.df))
+
+    faiss_scores = None
+    if query_vector is not None:
+        if filters:
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(candidates.astype('int64')))
+            D, I = shard.faiss_index.search(query_vector, len(candidates), params=params)
+        else:
+            D, I = shard.faiss_index.search(query_vector, len(candidates))
+        faiss_scores = np.zeros(len(shard.df))
+        valid = I[0] >= 0
+        faiss_scores[I[0][valid]] = D[0][valid]
+        faiss_scores = faiss_scores[candidates]
+
+    bm25_scores = shard_bm25_scores(shard.bm25[query_type], router.bm25_stats[query_type], query.split(), candidates)
+    return candidates, faiss_scores, bm25_scores
+
+# 라우터가 고른 샤드를 병렬로 검색한 뒤, 모은 후보 전체에서 정규화/결합해 상위 결과 선택
+def sharded_search(router, query, query_type, top_k, bm25_weight, min_score, use_facets):
+    departments = router.route(query)
+    filters = extract_filters(query, router.facet_index) if use_facets else {}
+    logging.info(f"샤드 라우팅: {departments}, 패싯 필터: {filters}")
+
+    # 인코딩 실패/시간 초과 시 BM25 단독 결과로 진행
+    query_vector = None
+    try:
+        query_vector = query_encoder.encode(query, timeout=DENSE_TIMEOUT).reshape(1, -1)
+        faiss.normalize_L2(query_vector)
+    except FutureTimeoutError:
+        logging.warning(f"쿼리 인코딩 시간 초과 ({DENSE_TIMEOUT}s)")
+    except Exception as e:
+        logging.error(f"쿼리 인코딩 실패: {e}")
+
+    started = time.perf_counter()
+    futures = {
+        department: search_executor.submit(
+            timed_branch, f"shard:{department}", search_shard, router,
+            router.shards[department], query, query_type, query_vector, filters)
+        for department in departments
+    }
+    parts = []
+    for department, future in futures.items():
+        result = wait_branch(f"shard:{department}", future, started, SHARD_TIMEOUT)
+        if result is not None and len(result[0]) > 0:
+            parts.append((router.shards[department], *result))
+    if not parts:
+        return []
+
+    owners = [(shard, candidate) for shard, candidates, _, _ in parts for candidate in candidates]
+    faiss_scores = None
+    if all(part[2] is not None for part in parts):
+        faiss_scores = np.concatenate([part[2] for part in parts])
+    bm25_scores = np.concatenate([part[3] for part in parts])
+
+    combined_scores = fuse_scores(faiss_scores, bm25_scores, bm25_weight)
+    scored = []
+    for idx in np.argsort(combined_scores)[::-1]:
+        score = combined_scores[idx]
+        if score < min_score or len(scored) >= top_k: #점수 필터링
+            break
+        shard, candidate = owners[idx]
+        scored.append((float(score), shard.df.iloc[candidate]))
+    return scored
+
+# 전체 카탈로그 검색: 패싯 필터 후 dense / sparse 동시 실행
+def global_search(df, query, query_type, top_k, bm25_weight, min_score, use_facets):
+    # 패싯 필터로 후보 행 제한 (이수구분, 개설학기, 과제, 조모임, 시험, 출결, 평점)
+    facet_index = get_facet_index(df, DATASET_PATH)
+    filters = extract_filters(query, facet_index) if use_facets else {}
+    if filters:
+        candidates = facet_index.candidates(filters)
+        logging.info(f"패싯 필터: {filters} → 후보 {len(candidates)}/{len(df)}건")
+        if len(candidates) == 0:
+            return []
+    else:
+        candidates = np.arange(len(df))
+
+    # dense / sparse 검색을 동시에 실행
+    candidate_df = df.iloc[candidates]
+    started = time.perf_counter()
+    dense_future = search_executor.submit(
+        timed_branch, "dense", dense_scores, query, candidates, len(df), bool(filters))
+    sparse_future = search_executor.submit(
+        timed_branch, "sparse", sparse_scores, query, candidate_df, query_type)
+
+    faiss_scores = wait_branch("dense", dense_future, started, DENSE_TIMEOUT)
+    bm25_scores = wait_branch("sparse", sparse_future, started, SPARSE_TIMEOUT)
+
+    # 점수 정규화 & 결합 (후보 행 기준)
+    combined_scores = fuse_scores(faiss_scores, bm25_scores, bm25_weight)
+    if combined_scores is None:
+        return []
+
+    # 상위 결과 추출
+    return top_rows(df, candidates, combined_scores, top_k, min_score)
+
+# 핵심 함수: 하이브리드 검색 + 쿼리 유형별 텍스트 구성
+def hybrid_search(query, top_k=FAISS_TOP_K, bm25_weight=BM25_WEIGHT, min_score=MIN_SCORE,
+                  use_facets=True, save_history=True):
+    logging.info(f"\n Searching for: '{query}'")
+    # 학과별 샤드가 있으면 강의명 직접 검색도 해당 샤드 카탈로그에서만 수행
+    router = get_shard_router()
+    if router is not None:
+        df = None
+        course_info = router.find_course(query)
+        direct_course_result = course_summary(course_info) if course_info is not None else None
+    else:
+        df = get_dataset()
+        if df is None:
+            logging.error("데이터 로드 실패, 검색 중단")
+            return []
+        direct_course_result = search_course_directly(query, df)
+
+    if direct_course_result:
+        logging.info("강의명을 직접 입력하여 CSV에서 검색 완료!")
+        if save_history:
+            add_search_results_to_history(query, direct_course_result)
+        return direct_course_result
+
+    # 질의 유형 분류
+    query_type = classify_query_type(query)
+    logging.info(f"질의 유형: {query_type}")
+
+    # 학과별 샤드가 있으면 관련 샤드만, 없으면 전체 카탈로그 검색
+    if router is not None:
+        scored = sharded_search(router, query, query_type, top_k, bm25_weight, min_score, use_facets)
+    else:
+        scored = global_search(df, query, query_type, top_k, bm25_weight, min_score, use_facets)
+    search_results = [to_search_result(row, score) for score, row in scored]
+
+    if search_results and save_history:
         add_search_results_to_history(query, search_results)
     return search_results
 
@@ -155,19 +357,9 @@ class Query(BaseModel):
 
 @search_router.post("", include_in_schema=True)
 async def search_courses(query: Query):
+    # 데이터 로딩과 강의명 직접 검색은 hybrid_search 안에서 스레드 풀로 함께 처리
     try:
-        user_query = query.query
-        df = load_dataset()
-        if df is None:
-            raise HTTPException(status_code=500, detail="데이터셋 로드 실패")
-
-        direct_course_result = search_course_directly(user_query, df)
-        if direct_course_result:
-            logging.info("강의명을 직접 입력하여 CSV에서 검색 완료!")
-            add_search_results_to_history(user_query, direct_course_result)
-            return {"results": direct_course_result}
-
-        search_results = hybrid_search(user_query)
+        search_results = await run_in_threadpool(hybrid_search, query.query)
         if not search_results:
             return {"results": [], "message": "관련 강의를 찾을 수 없습니다."}
 
@@ -0,0 +1,199 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import math
+import pickle
+import logging
+import threading
+import faiss
+import numpy as np
+import pandas as pd
+from collections import Counter
+from rank_bm25 import BM25Okapi
+
+from backend.facets import FacetIndex
+
+# 학과별 샤드 저장 위치 (embedding/shards/manifest.json 이 있으면 샤드 검색 사용)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SHARD_DIR = os.getenv("SHARD_DIR", os.path.join(BASE_DIR, "embedding", "shards"))
+MANIFEST_FILE = "manifest.json"
+QUERY_TYPES = ["course", "professor"]
+
+
+# 학과 하나의 검색 공간 (카탈로그 일부, 벡터, BM25 통계, 패싯 인덱스)
+class Shard:
+    def __init__(self, name, df, faiss_index, bm25):
+        self.name = name
+        self.df = df
+        self.faiss_index = faiss_index
+        self.bm25 = bm25  # 질의 유형 → BM25Okapi
+        self.facet_index = FacetIndex(df)
+
+
+# 질의에서 학과/교수명/강의명을 찾아 검색할 샤드를 고름
+class ShardRouter:
+    def __init__(self, shards, professors, courses):
+        self.shards = shards
+        self.professors = professors  # 교수명 → 학과 목록
+        self.courses = courses        # 강의명 → 학과 목록
+        # 필터는 전체 카탈로그 기준으로 한 번만 추출 (샤드에 없는 값이면 그 샤드는 후보 0건)
+        self.facet_index = FacetIndex(pd.concat([shard.df for shard in shards.values()], ignore_index=True))
+        # 샤드 간 BM25 점수를 비교할 수 있도록 전체 카탈로그 기준 IDF/평균 문서 길이 사용
+        self.bm25_stats = {
+            query_type: global_bm25_stats([shard.bm25[query_type] for shard in shards.values()])
+            for query_type in QUERY_TYPES
+        }
+        self.department_aliases = {}
+        for name in shards:
+            aliases = {name}
+            for suffix in ("학과", "과", "학부"):
+                if name.endswith(suffix) and len(name) - len(suffix) >= 2:
+                    aliases.add(name[:-len(suffix)])
+            self.department_aliases[name] = aliases
+
+    # 해당 학과가 없으면 전체 샤드로 fan-out
+    def route(self, query: str):
+        selected = set()
+        for name, aliases in self.department_aliases.items():
+            if any(alias in query for alias in aliases):
+                selected.add(name)
+        for professor, departments in self.professors.items():
+            if professor in query:
+                selected.update(departments)
+        for course, departments in self.courses.items():
+            if course in query:
+                selected.update(departments)
+        selected &= set(self.shards)
+        return sorted(selected) if selected else sorted(self.shards)
+
+    # 강의명과 정확히 같은 질의면 그 강의가 있는 샤드 카탈로그에서만 찾음
+    def find_course(self, name: str):
+        for department in self.courses.get(name, []):
+            shard = self.shards.get(department)
+            if shard is None:
+                continue
+            matched = shard.df[shard.df["강의명"] == name]
+            if not matched.empty:
+                return matched.iloc[0]
+        return None
+
+
+# 모든 샤드의 BM25 통계를 합쳐 전체 카탈로그 기준 IDF 계산 (rank_bm25 BM25Okapi와 같은 식)
+def global_bm25_stats(models):
+    doc_counts = Counter()
+    n_docs, total_len = 0, 0
+    for model in models:
+        n_docs += model.corpus_size
+        total_len += sum(model.doc_len)
+        for freqs in model.doc_freqs:
+            doc_counts.update(freqs.keys())
+
+    idf = {term: math.log(n_docs - n + 0.5) - math.log(n + 0.5) for term, n in doc_counts.items()}
+    if idf:
+        floor = models[0].epsilon * sum(idf.values()) / len(idf)
+        idf = {term: value if value >= 0 else floor for term, value in idf.items()}
+    return {"idf": idf, "avgdl": total_len / n_docs if n_docs else 0.0}
+
+# 샤드 후보 행의 BM25 점수 (전체 카탈로그 통계 기준이라 샤드끼리 비교 가능)
+def shard_bm25_scores(model, stats, query_tokens, candidates):
+    scores = np.zeros(len(candidates))
+    if stats["avgdl"] <= 0:
+        return scores
+    doc_len = np.asarray(model.doc_len, dtype=float)[candidates]
+    norm = model.k1 * (1 - model.b + model.b * doc_len / stats["avgdl"])
+    for token in query_tokens:
+        idf = stats["idf"].get(token)
+        if idf is None:
+            continue
+        tf = np.array([model.doc_freqs[i].get(token, 0) for i in candidates], dtype=float)
+        scores += idf * tf * (model.k1 + 1) / (tf + norm)
+    return scores
+
+
+# 전체 인덱스에서 학과별 샤드 생성
+def build_shards(df, faiss_index, output_dir=SHARD_DIR):
+    from backend.search import get_combined_text
+
+    if faiss_index.ntotal != len(df):
+        raise ValueError(f"FAISS 벡터 수({faiss_index.ntotal})와 데이터 행 수({len(df)})가 다릅니다.")
+    vectors = faiss_index.reconstruct_n(0, faiss_index.ntotal).astype('float32')
+    faiss.normalize_L2(vectors)
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {"shards": {}, "professors": {}, "courses": {}}
+    departments = df["학과"].fillna("기타").astype(str)
+
+    for shard_no, (department, positions) in enumerate(departments.groupby(departments).indices.items()):
+        shard_dir = os.path.join(output_dir, f"shard_{shard_no:03d}")
+        os.makedirs(shard_dir, exist_ok=True)
+        shard_df = df.iloc[positions].reset_index(drop=True)
+
+        shard_index = faiss.IndexFlatIP(vectors.shape[1])
+        shard_index.add(vectors[positions])
+        faiss.write_index(shard_index, os.path.join(shard_dir, "faiss_index.bin"))
+
+        bm25 = {
+            query_type: BM25Okapi([get_combined_text(row, query_type).split() for _, row in shard_df.iterrows()])
+            for query_type in QUERY_TYPES
+        }
+        with open(os.path.join(shard_dir, "bm25_index.pkl"), "wb") as file:
+            pickle.dump(bm25, file)
+        shard_df.to_pickle(os.path.join(shard_dir, "catalog.pkl"))
+
+        manifest["shards"][department] = os.path.basename(shard_dir)
+        for professor in shard_df["교수명"].dropna().unique():
+            manifest["professors"].setdefault(str(professor), []).append(department)
+        for course in shard_df["강의명"].dropna().unique():
+            manifest["courses"].setdefault(str(course), []).append(department)
+        logging.info(f"🔹 Shard '{department}': {len(shard_df)} rows → {shard_dir}")
+
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=4)
+    return manifest
+
+def load_shard_router(shard_dir=SHARD_DIR):
+    with open(os.path.join(shard_dir, MANIFEST_FILE), "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    shards = {}
+    for department, dirname in manifest["shards"].items():
+        path = os.path.join(shard_dir, dirname)
+        df = pd.read_pickle(os.path.join(path, "catalog.pkl"))
+        faiss_index = faiss.read_index(os.path.join(path, "faiss_index.bin"))
+        with open(os.path.join(path, "bm25_index.pkl"), "rb") as file:
+            bm25 = pickle.load(file)
+        shards[department] = Shard(department, df, faiss_index, bm25)
+    logging.info(f"🔹 Loaded {len(shards)} department shards from: {shard_dir}")
+    return ShardRouter(shards, manifest["professors"], manifest["courses"])
+
+
+# 샤드가 빌드되어 있으면 한 번만 불러와 재사용 (없으면 None → 전체 인덱스 검색)
+_router_cache = {}
+_router_lock = threading.Lock()
+
+def get_shard_router(shard_dir=SHARD_DIR):
+    manifest_path = os.path.join(shard_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    version = os.path.getmtime(manifest_path)
+    with _router_lock:
+        if _router_cache.get("version") != version:
+            try:
+                _router_cache["router"] = load_shard_router(shard_dir)
+            except Exception as e:
+                logging.error(f"Shard load failed: {e}")
+                _router_cache["router"] = None
+            _router_cache["version"] = version
+        return _router_cache["router"]
+
+
+if __name__ == "__main__":
+    from backend.config import DATASET_PATH, FAISS_INDEX_PATH
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    dataset = pd.read_csv(DATASET_PATH, encoding="utf-8-sig")
+    build_shards(dataset, faiss.read_index(FAISS_INDEX_PATH))
+
+__all__ = ["Shard", "ShardRouter", "build_shards", "get_shard_router", "shard_bm25_scores"]
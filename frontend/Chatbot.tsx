@@ -80,6 +80,11 @@ const Chatbot = () => {
       const botResponse = { sender: "bot", text: data.response };
 
       setMessages((prevMessages) => prevMessages.slice(0, -1).concat(botResponse));
+
+      // 요약 답변으로 먼저 응답한 경우, 늦게 도착하는 GPT 답변을 이어서 표시
+      if (data.answer_id) {
+        pollLateAnswer(data.answer_id);
+      }
     } catch (error) {
       setMessages((prevMessages) =>
         prevMessages.slice(0, -1).concat({ sender: "bot", text: "서버 오류 발생" })
@@ -89,6 +94,26 @@ const Chatbot = () => {
     }
   };
 
+  // 마감 이후 도착한 GPT 답변 조회
+  const pollLateAnswer = async (answerId: string, attempts: number = 15) => {
+    for (let i = 0; i < attempts; i++) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      try {
+        const response = await fetch(`${API_URL}/api/chat/late/${answerId}`);
+        if (!response.ok) return;
+
+        const data = await response.json();
+        if (data.status === "done") {
+          setMessages((prev) => prev.concat({ sender: "bot", text: data.response }));
+          return;
+        }
+        if (data.status === "failed") return;
+      } catch (error) {
+        return;
+      }
+    }
+  };
+
   // 시간 선택 후 강의 추천 요청 (기능 추가)
   const sendManualTimeQuery = async () => {
     if (selectedTimes.length === 0) {
@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import types
+import importlib
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("rank_bm25")
+pytest.importorskip("sentence_transformers")
+
+DIM = 8
+
+# backend/config.py는 저장소에 없으므로 (API 키 등 로컬 설정) 테스트용 설정 모듈로 대체
+@pytest.fixture
+def search(monkeypatch, tmp_path):
+    config = types.ModuleType("backend.config")
+    config.FAISS_INDEX_PATH = str(tmp_path / "faiss_index.bin")
+    config.BM25_INDEX_PATH = str(tmp_path / "bm25_index.pkl")
+    config.DATASET_PATH = str(tmp_path / "dataset.csv")
+    config.FAISS_TOP_K = 5
+    config.BM25_WEIGHT = 0.5
+    config.OPENAI_API_KEY = ""
+    monkeypatch.setitem(sys.modules, "backend.config", config)
+    return importlib.import_module("backend.search")
+
+
+def make_row(department, course, professor, overview):
+    return {
+        "학과": department, "강의명": course, "교수명": professor, "개설학기": "1학기",
+        "이수구분": "전선", "강의구성": "이론", "평점": 4.0, "과제": "보통", "조모임": "없음",
+        "성적": "보통", "출결": "전자출결", "시험": "두 번", "학정번호": course,
+        "강의시간": "월1", "교과목개요": overview,
+    }
+
+# 전자공학과 4과목(관련 과목 1개) + 관련 없는 1과목짜리 샤드
+@pytest.fixture
+def router(search, tmp_path):
+    from backend.shards import build_shards, load_shard_router
+
+    df = pd.DataFrame([
+        make_row("전자공학과", "신호및시스템", "김교수", "푸리에 변환 신호 해석"),
+        make_row("전자공학과", "전자회로1", "이교수", "다이오드 트랜지스터 증폭기"),
+        make_row("전자공학과", "전자기학", "박교수", "맥스웰 방정식 전자기파"),
+        make_row("전자공학과", "디지털논리", "최교수", "불 대수 조합 회로"),
+        make_row("체육학과", "생활체육", "정교수", "운동 건강 관리"),
+    ])
+    vectors = np.eye(DIM, dtype='float32')[[0, 1, 2, 3, 4]]
+    vectors[1, 0] = 0.3  # 관련 과목과 조금 비슷한 과목
+    index = faiss.IndexFlatIP(DIM)
+    index.add(vectors)
+    build_shards(df, index, str(tmp_path / "shards"))
+    return load_shard_router(str(tmp_path / "shards"))
+
+def query_vector(vector):
+    return lambda text, timeout=None: np.asarray(vector, dtype='float32')
+
+# 한 행짜리 무관한 샤드가 샤드 내 정규화로 1.0을 받아 관련 과목을 앞서면 안 됨
+def test_fan_out_ranks_relevant_course_first(search, router, monkeypatch):
+    monkeypatch.setattr(search.query_encoder, "encode", query_vector(np.eye(DIM)[0]))
+    assert len(router.route("푸리에 변환 배우는 수업")) == 2
+
+    scored = search.sharded_search(router, "푸리에 변환 배우는 수업", "course", 5, 0.5, 0.0, use_facets=False)
+    ranking = [row["강의명"] for _, row in scored]
+    assert ranking[0] == "신호및시스템"
+    assert ranking.index("생활체육") > ranking.index("전자회로1")
+
+# 인코딩이 실패해도 500 대신 BM25 단독 결과로 응답
+def test_encode_failure_falls_back_to_bm25(search, router, monkeypatch):
+    def fail(text, timeout=None):
+        raise RuntimeError("model unavailable")
+    monkeypatch.setattr(search.query_encoder, "encode", fail)
+
+    scored = search.sharded_search(router, "푸리에 변환", "course", 3, 0.5, 0.0, use_facets=False)
+    assert scored[0][1]["강의명"] == "신호및시스템"
+
+# 강의명 직접 검색은 전체 CSV를 읽지 않고 해당 샤드 카탈로그에서 찾음
+def test_direct_course_lookup_uses_shard_catalog(search, router, monkeypatch):
+    def full_catalog():
+        raise AssertionError("샤드가 있으면 전체 카탈로그를 읽지 않아야 함")
+    monkeypatch.setattr(search, "get_shard_router", lambda: router)
+    monkeypatch.setattr(search, "load_dataset", full_catalog)
+
+    results = search.hybrid_search("전자기학", save_history=False)
+    assert [(r["강의명"], r["교수명"]) for r in results] == [("전자기학", "박교수")]